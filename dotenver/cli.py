@@ -2,6 +2,7 @@
 
 import argparse
 import glob
+import os
 import sys
 from pathlib import Path
 
@@ -12,6 +13,9 @@ from . import __version__, dotenver
 
 def check_file_path(file_path):
     """Validate that the given file_path exists and can read."""
+    if file_path == "-":
+        return file_path
+
     file_path = Path(file_path)
     dotenv_path = dotenver.get_dotenv_path(file_path)
 
@@ -61,6 +65,30 @@ By default values in existing in .env files are respected, and missing variables
         "-o", "--override", action="store_true", help="override current .env files."
     )
 
+    parser.add_argument(
+        "-f",
+        "--format",
+        action="append",
+        choices=dotenver.OUTPUT_FORMATS,
+        dest="formats",
+        help=(
+            "output format to generate, can be given multiple times."
+            " The .env file is always generated. Default: 'dotenv'"
+        ),
+    )
+
+    current_group = parser.add_mutually_exclusive_group()
+    current_group.add_argument(
+        "--current",
+        metavar="file",
+        help="read existing values from this .env file. Only used with '-'.",
+    )
+    current_group.add_argument(
+        "--environ",
+        action="store_true",
+        help="read existing values from the environment. Only used with '-'.",
+    )
+
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
         "-r",
@@ -85,7 +113,10 @@ By default values in existing in .env files are respected, and missing variables
         type=check_file_path,
         nargs="*",
         default=False,
-        help="path to file to process",
+        help=(
+            "path to file to process, or '-' to read stdin and write to stdout."
+            " With '-', includes are relative to the current directory"
+        ),
     )
 
     args = parser.parse_args()
@@ -95,6 +126,28 @@ By default values in existing in .env files are respected, and missing variables
         return
 
     files = args.files
+    if files and "-" in files:
+        if len(files) > 1:
+            parser.error("'-' can not be used with other files")
+        if args.formats:
+            parser.error("'--format' can not be used with '-'")
+
+        current_env = {}
+        if not args.override and args.environ:
+            current_env = dotenver.get_environ_dict(os.environ)
+        elif not args.override and args.current:
+            current_env = dotenver.get_dotenv_dict(args.current)
+
+        dotenver.render_stream(
+            sys.stdin, sys.stdout, current_env, keep_extra=not args.environ
+        )
+        return
+
+    if args.current:
+        parser.error("'--current' can only be used with '-'")
+    if args.environ:
+        parser.error("'--environ' can only be used with '-'")
+
     if args.recursive:
         files = glob.glob(args.pattern, recursive=True)
 
@@ -131,7 +184,9 @@ By default values in existing in .env files are respected, and missing variables
             )
             return
 
-    dotenver.parse_files(files, override=args.override)
+    dotenver.parse_files(
+        files, override=args.override, formats=args.formats or ("dotenv",)
+    )
     return
 
 
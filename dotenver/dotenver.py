@@ -1,7 +1,12 @@
 """Generate .env files from .env.example templates."""
 
+import ast
+import functools
 import io
+import json
+import os
 import re
+import shlex
 import sys
 from pathlib import Path
 
@@ -47,6 +52,22 @@ TEMPLATE_REGEX = re.compile(
     ),
     re.VERBOSE,
 )
+
+INCLUDE_REGEX = re.compile(
+    r"""
+    ^\s*
+    \#\#\ +dotenver:include\b        # Start of the dotenver include comment
+    (?:
+        \s+
+        (\S+)                          # Path to the included template
+        \s*
+        (?:\#.*)?                      # Optional comment
+        $
+    )?
+    """,
+    re.VERBOSE,
+)
+
 FAKE = Faker()
 
 
@@ -85,78 +106,371 @@ def dotenver(generator, name=None, quotes=None, escape_with="\\", **kwargs):
         VARIABLES[key] = value
 
     if quotes:
-        value = value.replace(quotes, f"{escape_with}{quotes}")
-        value = f"{quotes}{value}{quotes}"
+        value = quote_value(value, quotes, escape_with)
 
     return value
 
 
-def parse_stream(template_stream, current_dotenv):
-    """Parse a dotenver template."""
+def quote_value(value, quotes, escape_with="\\"):
+    """Surround the value with `quotes`, escaping them with `escape_with`."""
+    value = value.replace(quotes, f"{escape_with}{quotes}")
+    return f"{quotes}{value}{quotes}"
+
+
+# Jinja2 literals, accepted in addition to Python ones.
+JINJA2_LITERALS = {
+    "true": True,
+    "false": False,
+    "none": None,
+}
+
+
+class Jinja2Literals(ast.NodeTransformer):
+    """Replace Jinja2 literal names with their constant values."""
+
+    def visit_Name(self, node):
+        """Return a constant node for Jinja2 literals."""
+        if node.id in JINJA2_LITERALS:
+            return ast.copy_location(ast.Constant(JINJA2_LITERALS[node.id]), node)
+
+        return node
+
+
+@functools.lru_cache(maxsize=None)
+def parse_arguments(arguments):
+    """
+    Parse the arguments of a dotenver comment into a dict of keyword arguments.
+
+    Only literal values are accepted, as with `ast.literal_eval`, so no
+    arbitrary code can be run from a template. Jinja2 `true`, `false`
+    and `none` are accepted as well.
+    Results are cached, as the same arguments are usually repeated many times.
+    """
+    if not arguments or not arguments.strip():
+        return {}
+
+    try:
+        call = ast.parse(f"dotenver({arguments})", mode="eval").body
+    except SyntaxError:
+        call = None
+
+    if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+        raise ValueError(f"Invalid arguments in dotenver comment: '{arguments}'")
+
+    if call.args or any(keyword.arg is None for keyword in call.keywords):
+        raise ValueError(
+            f"Only keyword arguments are allowed in dotenver comments: '{arguments}'"
+        )
+
+    kwargs = {}
+    for keyword in call.keywords:
+        try:
+            kwargs[keyword.arg] = ast.literal_eval(
+                Jinja2Literals().visit(keyword.value)
+            )
+        except ValueError:
+            raise ValueError(
+                f"Only literal values are allowed in dotenver comments:"
+                f" '{keyword.arg}' in '{arguments}'"
+            ) from None
+
+    return kwargs
+
+
+def get_current_line(left_side, current_value, key):
+    """
+    Return a tuple (text, dotenver_call) for a variable with an existing value.
+
+    The existing value is returned by `dotenver_call`, so it is never
+    rendered as a Jinja2 template.
+
+    If the variable has a named value, the existing value is kept, so it is
+    used by other variables with the same name.
+    """
+    if key:
+        try:
+            VARIABLES[key]
+        except KeyError:
+            VARIABLES[key] = current_value
+
+    if current_value is None:
+        return left_side, None
+
+    return f"{left_side}=", functools.partial(str, current_value)
+
+
+def get_template_line(left_side, value, generator, name, arguments):
+    """
+    Return a tuple (text, dotenver_call) for a variable without existing value.
+
+    `dotenver_call` is None, or a callable returning the value to append
+    to `text`.
+    """
+    if generator:
+        kwargs = dict(parse_arguments(arguments))
+        if name is not None:
+            if "name" in kwargs:
+                raise ValueError(
+                    f"Value name for '{generator}' given twice: '{name}' and"
+                    f" '{kwargs['name']}'"
+                )
+            kwargs["name"] = name
+
+        dotenver_call = functools.partial(dotenver, generator, **kwargs)
+        return f"{left_side}=", dotenver_call
+
+    if value:
+        return f"{left_side}={value}", None
+
+    return left_side, None
+
+
+def get_include_path(line):
+    """
+    Return the included template path of an include line, or None.
+
+    Raise a ValueError for include lines without a valid path.
+    """
+    match = INCLUDE_REGEX.match(line)
+    if not match:
+        return None
+
+    if not match.group(1):
+        raise ValueError(f"Invalid dotenver include: '{line.strip()}'")
+
+    return match.group(1)
+
+
+def compile_include(include_path):
+    """
+    Parse and compile an included dotenver template.
+
+    Return a tuple (variables, template), where `variables` is a list with
+    a tuple (variable, left_side, key) for each variable in the included
+    template, and `template` is a Jinja2 template.
+
+    The template must be rendered with `dotenver_current`, a dict with the
+    line to use for the index of each variable with an existing value.
+    """
     jinja2_template = io.StringIO()
+    dotenver_calls = []
+    variables = []
 
     env = Environment(keep_trailing_newline=True)
     env.globals["dotenver"] = dotenver
 
-    extra_variables = current_dotenv.copy()
+    with open(include_path, "r") as include_file:
+        for line in include_file:
+            if get_include_path(line):
+                raise ValueError(
+                    f"Included template '{include_path}' can not include templates"
+                )
+
+            match = TEMPLATE_REGEX.match(line)
+            if not match:
+                jinja2_template.write(f"{line.strip()}\n")
+                continue
+
+            left_side, variable, value, generator, name, arguments = match.groups()
+            text, dotenver_call = get_template_line(
+                left_side, value, generator, name, arguments
+            )
+            if dotenver_call:
+                text = f"{text}{{{{ dotenver_calls[{len(dotenver_calls)}]() }}}}"
+                dotenver_calls.append(dotenver_call)
+
+            index = len(variables)
+            jinja2_template.write(
+                f"{{% if {index} in dotenver_current %}}"
+                f"{{{{ dotenver_current[{index}] }}}}"
+                f"{{% else %}}{text.strip()}{{% endif %}}\n"
+            )
+            variables.append((variable, left_side, get_value_key(generator, name)))
+
+    template = env.from_string(
+        jinja2_template.getvalue(), globals={"dotenver_calls": dotenver_calls}
+    )
+
+    return variables, template
+
+
+def render_include(include_template, dotenver_current):
+    """Render an included template, without its trailing new line."""
+    return include_template.render(dotenver_current=dotenver_current)[:-1]
+
+
+EXTRA_VARIABLES_HEADER = """
+######################################
+# Variables not in Dotenver template #
+######################################
+"""
+
+
+def parse_lines(
+    template_stream, current_dotenv, keep_extra=True, includes=None, directory="."
+):
+    """
+    Parse a dotenver template line by line.
+
+    Yield a tuple (text, dotenver_call) for each output line, where
+    `dotenver_call` is None, or a callable returning the value to append
+    to `text`. Lines are yielded as soon as they are read.
+
+    Only `text` comes from the template, and may be rendered with Jinja2.
+    Existing values are always returned by `dotenver_call`.
+
+    Variables in `current_dotenv` not present in the template are yielded
+    at the end, unless `keep_extra` is False.
+
+    Included templates are resolved relative to `directory`, and compiled
+    only once for all templates sharing the same `includes` dict.
+    """
+    extra_variables = current_dotenv.copy() if keep_extra else {}
+    if includes is None:
+        includes = {}
+    # Variables defined in the template, and in included templates.
+    template_variables = set()
+    included_variables = {}
 
     for line in template_stream:
+        dotenver_call = None
+        include = get_include_path(line)
         match = TEMPLATE_REGEX.match(line)
-        if match:
+        if include:
+            include_path = Path(directory, include).resolve()
+            if include_path not in includes:
+                includes[include_path] = compile_include(include_path)
+            variables, include_template = includes[include_path]
+
+            for variable, _, _ in variables:
+                if variable in template_variables or variable in included_variables:
+                    raise ValueError(
+                        f"Variable '{variable}' from '{include_path}' is already"
+                        " defined"
+                    )
+            for variable, _, _ in variables:
+                included_variables[variable] = include_path
+
+            dotenver_current = {}
+            for index, (variable, left_side, key) in enumerate(variables):
+                if variable in current_dotenv:
+                    extra_variables.pop(variable, None)
+                    text, dotenver_call = get_current_line(
+                        left_side, current_dotenv[variable][1], key
+                    )
+                    dotenver_current[index] = (
+                        f"{text}{dotenver_call()}" if dotenver_call else text
+                    )
+
+            dotenver_call = functools.partial(
+                render_include, include_template, dotenver_current
+            )
+            line = ""
+        elif match:
             left_side, variable, value, generator, name, arguments = match.groups()
 
+            if variable in included_variables:
+                raise ValueError(
+                    f"Variable '{variable}' is already defined in"
+                    f" '{included_variables[variable]}'"
+                )
+            template_variables.add(variable)
+
             if variable in current_dotenv:
-                current_value = current_dotenv[variable][1]
-                try:
-                    del extra_variables[variable]
-                except KeyError:
-                    pass
-
-                # Keep track of existing named values.
-                key = get_value_key(generator, name)
-                if key:
-                    try:
-                        VARIABLES[key]
-                    except KeyError:
-                        VARIABLES[key] = current_value
-
-                line = (
-                    f"{left_side}={current_value}"
-                    if current_value is not None
-                    else left_side
+                extra_variables.pop(variable, None)
+                line, dotenver_call = get_current_line(
+                    left_side,
+                    current_dotenv[variable][1],
+                    get_value_key(generator, name),
                 )
-            elif generator:
-                dotenver_args = f"'{generator}'"
-                if name:
-                    dotenver_args = f"{dotenver_args}, '{name}'"
-                if arguments:
-                    dotenver_args = f"{dotenver_args}, {arguments}"
-                line = f"{left_side}={{{{ dotenver({dotenver_args}) }}}}"
-            elif value:
-                line = f"{left_side}={value}"
             else:
-                line = left_side
+                line, dotenver_call = get_template_line(
+                    left_side, value, generator, name, arguments
+                )
 
-        jinja2_template.write(f"{line.strip()}\n")
+        yield line.strip(), dotenver_call
 
     if extra_variables:
-        jinja2_template.write(
-            """
-######################################
-# Variables not in Dotenver template #
-######################################
-
-"""
-        )
+        for line in EXTRA_VARIABLES_HEADER.splitlines():
+            yield line, None
+        yield "", None
         for left_side, value in extra_variables.values():
-            template_string = f"{left_side}={value}" if value is not None else left_side
-            jinja2_template.write(f"{template_string}\n")
+            line = f"{left_side}={value}" if value is not None else left_side
+            yield "", functools.partial(str, line)
+
+
+def parse_stream(template_stream, current_dotenv, includes=None, directory="."):
+    """Parse a dotenver template."""
+    jinja2_template = io.StringIO()
+    dotenver_calls = []
 
-    template = env.from_string(jinja2_template.getvalue())
+    env = Environment(keep_trailing_newline=True)
+    env.globals["dotenver"] = dotenver
+
+    for text, dotenver_call in parse_lines(
+        template_stream, current_dotenv, includes=includes, directory=directory
+    ):
+        if dotenver_call:
+            # Calls are prepared here, so Jinja2 only has to look them up.
+            text = f"{text}{{{{ dotenver_calls[{len(dotenver_calls)}]() }}}}"
+            dotenver_calls.append(dotenver_call)
+        jinja2_template.write(f"{text}\n")
+
+    template = env.from_string(
+        jinja2_template.getvalue(), globals={"dotenver_calls": dotenver_calls}
+    )
 
     return template
 
 
+def render_stream(
+    template_stream, output_stream, current_dotenv, keep_extra=True, directory="."
+):
+    """
+    Render a dotenver template line by line into `output_stream`.
+
+    Each line is written as soon as it is read from `template_stream`, so
+    output starts before the whole template is read.
+    Unlike `parse_files`, named values are only known once they are read, so
+    an existing named value is not used for a generator appearing before it.
+
+    Each line is rendered on its own, so Jinja2 blocks spanning several
+    lines, like `{% if %}...{% endif %}`, are not supported.
+    Included templates are resolved relative to `directory`.
+    """
+    env = Environment(keep_trailing_newline=True)
+    env.globals["dotenver"] = dotenver
+
+    for text, dotenver_call in parse_lines(
+        template_stream, current_dotenv, keep_extra=keep_extra, directory=directory
+    ):
+        if "{" in text:
+            text = env.from_string(text).render()
+        if dotenver_call:
+            text = f"{text}{dotenver_call()}"
+        output_stream.write(f"{text}\n")
+        output_stream.flush()
+
+
+def get_environ_dict(environ):
+    """
+    Return a dictionary of values from the given environment mapping.
+
+    Items have the same format as the ones returned by `get_dotenv_dict`.
+    Values are double quoted, with backslashes, double quotes and new lines
+    escaped, so any value can be written to a .env file.
+    """
+    return {
+        variable: (variable, quote_value(escape_value(value), '"'))
+        for variable, value in environ.items()
+    }
+
+
+def escape_value(value):
+    """Escape backslashes and new lines in the given value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace("\r", "\\r")
+
+
 def get_dotenv_path(template_path):
     """Return the .env path for the given template path."""
     if template_path.suffix == ".example":
@@ -165,6 +479,22 @@ def get_dotenv_path(template_path):
     return template_path.with_name(".env")
 
 
+def parse_dotenv_stream(dotenv_stream):
+    """
+    Parse a .env stream and return a dictionary of the parsed data.
+
+    Each item has the VARIABLE as the key, and the value is a tuple:
+    (assignment, value)
+    """
+    values = dict()
+    for line in dotenv_stream:
+        match = VALUES_REGEX.match(line)
+        if match:
+            assignment, variable, value = match.groups()
+            values[variable] = (assignment, value)
+    return values
+
+
 def get_dotenv_dict(dotenv_path):
     """
     Read a .env file and return a dictionary of the parsed data.
@@ -174,14 +504,9 @@ def get_dotenv_dict(dotenv_path):
 
     If the file does not exist, return an empty dict.
     """
-    values = dict()
     try:
         with open(dotenv_path, "r") as dotenv_file:
-            for line in dotenv_file:
-                match = VALUES_REGEX.match(line)
-                if match:
-                    assignment, variable, value = match.groups()
-                    values[variable] = (assignment, value)
+            return parse_dotenv_stream(dotenv_file)
     except FileNotFoundError:
         pass
     except Exception:
@@ -193,14 +518,190 @@ def get_dotenv_dict(dotenv_path):
             file=sys.stderr,
         )
         raise
-    return values
+    return dict()
+
+
+QUOTED_VALUE_REGEX = re.compile(
+    r"""
+    ^
+    (['"])                              # Opening quote
+    ((?:\\.|(?!\1).)*)                 # Quoted value, with escaped characters
+    \1                                  # Closing quote
+    \s*(?:\#.*)?                        # Optional inline comment
+    $
+    """,
+    re.VERBOSE,
+)
+
+INLINE_COMMENT_REGEX = re.compile(r"\s+\#.*$")
+
+
+def parse_value(value):
+    """
+    Return the actual value of a verbatim .env value.
+
+    Quoted values have their quotes removed, and inner quotes unescaped.
+    Inline comments, which start with a `#` after a whitespace or after the
+    closing quote, are removed. A `#` inside quotes is part of the value.
+    """
+    match = QUOTED_VALUE_REGEX.match(value)
+    if match:
+        quotes, quoted_value = match.groups()
+        return quoted_value.replace(f"\\{quotes}", quotes)
+
+    return INLINE_COMMENT_REGEX.sub("", value)
+
+
+def get_json_path(template_path):
+    """Return the JSON output path for the given template path."""
+    dotenv_path = get_dotenv_path(template_path)
+    return dotenv_path.with_name(f"{dotenv_path.name}.json")
+
+
+def get_shell_path(template_path):
+    """Return the shell export script path for the given template path."""
+    dotenv_path = get_dotenv_path(template_path)
+    return dotenv_path.with_name(f"{dotenv_path.name}.sh")
 
 
-def parse_files(templates_paths, override=False):
-    """Parse multiple dotenver templates and generate or update a .env for each."""
+def get_secret_path(template_path):
+    """Return the Kubernetes Secret manifest path for the given template path."""
+    dotenv_path = get_dotenv_path(template_path)
+    return dotenv_path.with_name(f"{dotenv_path.name}.secret.yaml")
+
+
+def get_secret_name(template_path):
+    """
+    Return a valid Kubernetes resource name for the given template path.
+
+    The name is built from the directory and the .env file names, so
+    templates in the same directory get different names.
+    """
+    dotenv_path = get_dotenv_path(template_path.resolve())
+    name = re.sub(
+        r"[^a-z0-9]+", "-", f"{dotenv_path.parent.name}-{dotenv_path.name}".lower()
+    )
+    return name.strip("-")[:253].strip("-") or "dotenver"
+
+
+def write_dotenv(template_path, rendered_template, values):
+    """Return the rendered template as is."""
+    return rendered_template
+
+
+def write_json(template_path, rendered_template, values):
+    """
+    Return the values as a JSON object. Unassigned variables are null.
+
+    Values are parsed with `parse_value`, as for the other non-dotenv formats.
+    """
+    return (
+        json.dumps(
+            {
+                variable: parse_value(value) if value is not None else None
+                for variable, (_, value) in values.items()
+            },
+            indent=2,
+        )
+        + "\n"
+    )
+
+
+SHELL_NAME_REGEX = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def write_shell(template_path, rendered_template, values):
+    """
+    Return the values as a shell script of export commands.
+
+    Variables whose names are not valid shell identifiers are skipped.
+    """
+    lines = []
+    for variable, (_, value) in values.items():
+        if not SHELL_NAME_REGEX.match(variable):
+            continue
+        if value is None:
+            lines.append(f"export {variable}\n")
+        else:
+            lines.append(f"export {variable}={shlex.quote(parse_value(value))}\n")
+    return "".join(lines)
+
+
+SECRET_KEY_REGEX = re.compile(r"^[-._a-zA-Z0-9]+$")
+
+
+def write_secret(template_path, rendered_template, values):
+    """
+    Return the values as a Kubernetes Secret manifest.
+
+    Variables whose names are not valid Secret keys are skipped.
+    """
+    # JSON strings are valid YAML scalars, so no YAML library is needed.
+    lines = [
+        "apiVersion: v1\n",
+        "kind: Secret\n",
+        "metadata:\n",
+        f"  name: {get_secret_name(template_path)}\n",
+        "type: Opaque\n",
+        "stringData:\n",
+    ]
+    for variable, (_, value) in values.items():
+        if value is not None and SECRET_KEY_REGEX.match(variable):
+            value = json.dumps(parse_value(value))
+            lines.append(f"  {json.dumps(variable)}: {value}\n")
+    return "".join(lines)
+
+
+def is_writable(path):
+    """Return whether the given path can be written, or created if missing."""
+    if path.exists():
+        return os.access(path, os.W_OK)
+
+    return os.access(path.parent, os.W_OK)
+
+
+# Each output format maps to a pair of callables:
+# - a function returning the output path for a template path
+# - a writer returning the output content for a rendered template
+OUTPUT_FORMATS = {
+    "dotenv": (get_dotenv_path, write_dotenv),
+    "json": (get_json_path, write_json),
+    "shell": (get_shell_path, write_shell),
+    "secret": (get_secret_path, write_secret),
+}
+
+
+def parse_files(templates_paths, override=False, formats=("dotenv",)):
+    """
+    Parse multiple dotenver templates and generate or update a .env for each.
+
+    Each template is parsed and rendered once, and then written in every
+    output format given in `formats`, which must be keys of `OUTPUT_FORMATS`.
+
+    The .env file is always written, even if `dotenv` is not in `formats`,
+    as existing values are only read from it.
+    """
+    for output_format in formats:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'")
+
+    if "dotenv" not in formats:
+        formats = ("dotenv", *formats)
+
     colorama.init()
+
+    # Check all output paths before anything is written.
+    for _template_path in templates_paths:
+        for output_format in formats:
+            get_output_path, _ = OUTPUT_FORMATS[output_format]
+            output_path = get_output_path(Path(_template_path))
+            if not is_writable(output_path):
+                print(colorama.Fore.RED, file=sys.stderr, end="")
+                raise PermissionError(f"'{output_path}' is not writable")
     jinja2_templates = {}
     rendered_templates = {}
+    # Included templates are shared by all templates.
+    includes = {}
 
     # First pass will:
     # - capture all variables form templates and .env files
@@ -214,7 +715,10 @@ def parse_files(templates_paths, override=False):
         try:
             with open(template_path, "r") as template_file:
                 jinja2_templates[template_path] = parse_stream(
-                    template_file, current_env
+                    template_file,
+                    current_env,
+                    includes=includes,
+                    directory=template_path.parent,
                 )
         except Exception:
             print(
@@ -245,23 +749,26 @@ def parse_files(templates_paths, override=False):
             raise
 
     for template_path, rendered_template in rendered_templates.items():
-        dotenv_path = get_dotenv_path(template_path)
-        try:
-            with open(dotenv_path, "w") as dotenv_file:
-                dotenv_file.write(rendered_template)
-        except Exception:
+        values = parse_dotenv_stream(io.StringIO(rendered_template))
+        for output_format in formats:
+            get_output_path, writer = OUTPUT_FORMATS[output_format]
+            output_path = get_output_path(template_path)
+            try:
+                with open(output_path, "w") as output_file:
+                    output_file.write(writer(template_path, rendered_template, values))
+            except Exception:
+                print(
+                    colorama.Fore.RED,
+                    f"The following exception ocurred while writing to '{output_path}'",
+                    colorama.Fore.YELLOW,
+                    sep="",
+                    file=sys.stderr,
+                )
+                raise
+
             print(
-                colorama.Fore.RED,
-                f"The following exception ocurred while writing to '{dotenv_path}'",
-                colorama.Fore.YELLOW,
+                colorama.Fore.GREEN,
+                f"'{template_path}' rendered to '{output_path}'",
                 sep="",
                 file=sys.stderr,
             )
-            raise
-
-        print(
-            colorama.Fore.GREEN,
-            f"'{template_path}' rendered to '{dotenv_path}'",
-            sep="",
-            file=sys.stderr,
-        )
@@ -1,11 +1,15 @@
 """Tests for dotenver."""
 
+import io
+import json
+import sys
 import tempfile
 from pathlib import Path
 
+import pytest
 import toml
 
-from dotenver import __version__, dotenver
+from dotenver import __version__, cli, dotenver
 
 DIRECTORY = tempfile.TemporaryDirectory()
 
@@ -328,3 +332,435 @@ export FALSE_VARIABLE=False
 TRUE_VARIABLE=
 """
     assert DOTENV_FILE.read() == expected
+
+
+def test_multiple_formats():
+    """Test that all formats are written from a single render."""
+    set_dotenv("")
+
+    tamplate = get_tempfile(
+        """
+STATIC_VARIABLE="static 'value'"
+NAMED_VARIABLE= ## dotenver:pystr:formats(max_chars=10)
+UNASSIGNED
+"""
+    )
+    template_path = Path(tamplate.name)
+
+    dotenver.parse_files([tamplate.name], formats=("dotenv", "json", "shell", "secret"))
+
+    dotenv = DOTENV_FILE.read()
+    named = dotenver.get_dotenv_dict(DOTENV_FILE.name)["NAMED_VARIABLE"][1]
+    assert dotenv == f"""
+STATIC_VARIABLE="static 'value'"
+NAMED_VARIABLE={named}
+UNASSIGNED
+"""
+
+    with open(dotenver.get_json_path(template_path)) as json_file:
+        assert json.load(json_file) == {
+            "STATIC_VARIABLE": "static 'value'",
+            "NAMED_VARIABLE": named,
+            "UNASSIGNED": None,
+        }
+
+    with open(dotenver.get_shell_path(template_path)) as shell_file:
+        assert shell_file.read() == (
+            "export STATIC_VARIABLE='static '\"'\"'value'\"'\"''\n"
+            f"export NAMED_VARIABLE={named}\n"
+            "export UNASSIGNED\n"
+        )
+
+    with open(dotenver.get_secret_path(template_path)) as secret_file:
+        secret = secret_file.read()
+    assert "kind: Secret\n" in secret
+    assert '  "STATIC_VARIABLE": "static \'value\'"\n' in secret
+    assert f'  "NAMED_VARIABLE": "{named}"\n' in secret
+    assert "UNASSIGNED" not in secret
+
+
+def test_unknown_format():
+    """Test that unknown formats are rejected."""
+    with pytest.raises(ValueError):
+        dotenver.parse_files([TEMPLATE_FILE.name], formats=("unknown",))
+
+
+def test_arguments_are_parsed_as_literals():
+    """Test that generator arguments are parsed into keyword arguments."""
+    assert dotenver.parse_arguments(None) == {}
+    assert dotenver.parse_arguments("") == {}
+    assert dotenver.parse_arguments("length=20, quotes='\"'") == {
+        "length": 20,
+        "quotes": '"',
+    }
+
+
+def test_expressions_are_not_allowed_as_arguments():
+    """Test that generator arguments can not run arbitrary code."""
+    set_dotenv("")
+
+    tamplate = get_tempfile(
+        "VARIABLE= ## dotenver:boolean(chance_of_getting_true=__import__('os'))"
+    )
+
+    with pytest.raises(ValueError):
+        dotenver.parse_files([tamplate.name])
+
+    with pytest.raises(ValueError):
+        dotenver.parse_arguments("100")
+
+
+def test_render_stream():
+    """Test that a template is rendered from a stream into a stream."""
+    template = io.StringIO(
+        """
+STATIC_VARIABLE=static
+TRUE_VARIABLE= ## dotenver:boolean(chance_of_getting_true=100)
+EXISTING_VARIABLE=
+"""
+    )
+    output = io.StringIO()
+
+    dotenver.render_stream(
+        template,
+        output,
+        {
+            "EXISTING_VARIABLE": ("EXISTING_VARIABLE", "existing"),
+            "EXTRA": ("EXTRA", "1"),
+        },
+    )
+
+    expected = """
+STATIC_VARIABLE=static
+TRUE_VARIABLE=True
+EXISTING_VARIABLE=existing
+
+######################################
+# Variables not in Dotenver template #
+######################################
+
+EXTRA=1
+"""
+    assert output.getvalue() == expected
+
+
+def test_render_stream_without_extra():
+    """Test that extra values are not written when not kept."""
+    template = io.StringIO("EXISTING_VARIABLE=\n")
+    output = io.StringIO()
+
+    dotenver.render_stream(
+        template,
+        output,
+        dotenver.get_environ_dict({"EXISTING_VARIABLE": "existing", "EXTRA": "1"}),
+        keep_extra=False,
+    )
+
+    assert output.getvalue() == 'EXISTING_VARIABLE="existing"\n'
+
+
+def test_render_stream_writes_before_reading_all():
+    """Test that lines are written as soon as they are read."""
+    output = io.StringIO()
+
+    def template():
+        yield "FIRST=1\n"
+        assert output.getvalue() == "FIRST=1\n"
+        yield "SECOND=2\n"
+
+    dotenver.render_stream(template(), output, {})
+
+    assert output.getvalue() == "FIRST=1\nSECOND=2\n"
+
+
+def test_includes(monkeypatch):
+    """Test that included templates are compiled once and shared."""
+    set_dotenv(
+        """
+BASE_EXISTING=existing
+"""
+    )
+
+    base = get_tempfile(
+        """# Base
+BASE_STATIC=static
+BASE_EXISTING= ## dotenver:boolean(chance_of_getting_true=0)
+BASE_NAMED= ## dotenver:pystr:included(max_chars=10)
+"""
+    )
+    tamplate = get_tempfile(
+        f"""
+## dotenver:include {Path(base.name).name}
+NAMED= ## dotenver:pystr:included(max_chars=10)
+"""
+    )
+    other_directory = tempfile.TemporaryDirectory(dir=DIRECTORY.name)
+    other_tamplate = Path(other_directory.name, ".env.example")
+    other_tamplate.write_text(f"## dotenver:include ../{Path(base.name).name}\n")
+
+    compiled = []
+
+    def compile_include(include_path):
+        compiled.append(include_path)
+        return original_compile_include(include_path)
+
+    original_compile_include = dotenver.compile_include
+    monkeypatch.setattr(dotenver, "compile_include", compile_include)
+
+    dotenver.parse_files([tamplate.name, other_tamplate])
+
+    assert compiled == [Path(base.name).resolve()]
+
+    named = dotenver.get_dotenv_dict(DOTENV_FILE.name)["NAMED"][1]
+    expected = f"""
+# Base
+BASE_STATIC=static
+BASE_EXISTING=existing
+BASE_NAMED={named}
+NAMED={named}
+"""
+    assert DOTENV_FILE.read() == expected
+
+    other_dotenv = dotenver.get_dotenv_path(other_tamplate)
+    assert other_dotenv.read_text() == f"""# Base
+BASE_STATIC=static
+BASE_EXISTING=False
+BASE_NAMED={named}
+"""
+
+
+def test_nested_includes_are_not_allowed():
+    """Test that included templates can not include other templates."""
+    set_dotenv("")
+
+    nested = get_tempfile("NESTED=nested\n")
+    base = get_tempfile(f"## dotenver:include {Path(nested.name).name}\n")
+    tamplate = get_tempfile(f"## dotenver:include {Path(base.name).name}\n")
+
+    with pytest.raises(ValueError):
+        dotenver.parse_files([tamplate.name])
+
+
+def test_jinja2_literals_are_allowed_as_arguments():
+    """Test that Jinja2 true, false and none are parsed as literals."""
+    assert dotenver.parse_arguments("a=true, b=false, c=none, d=[true]") == {
+        "a": True,
+        "b": False,
+        "c": None,
+        "d": [True],
+    }
+
+
+def test_name_as_argument():
+    """Test that the value name can be given as an argument."""
+    set_dotenv("")
+
+    tamplate = get_tempfile(
+        """
+FIRST= ## dotenver:boolean(name='argument', chance_of_getting_true=0)
+SECOND= ## dotenver:boolean:argument(chance_of_getting_true=100)
+"""
+    )
+
+    dotenver.parse_files([tamplate.name])
+
+    expected = """
+FIRST=False
+SECOND=False
+"""
+    assert DOTENV_FILE.read() == expected
+
+    tamplate = get_tempfile("TWICE= ## dotenver:boolean:name(name='argument')")
+
+    with pytest.raises(ValueError):
+        dotenver.parse_files([tamplate.name])
+
+
+def test_shell_skips_invalid_names():
+    """Test that variables which are not shell identifiers are not exported."""
+    values = dotenver.parse_dotenv_stream(["my-var=1\n", "_VALID_1=2\n", "1NVALID=3\n"])
+
+    assert dotenver.write_shell(Path("/path/.env.example"), "", values) == (
+        "export _VALID_1=2\n"
+    )
+
+
+def test_secret_name():
+    """Test that Secret names are unique for templates in the same directory."""
+    assert dotenver.get_secret_name(Path("/path/My_App/.env.example")) == "my-app-env"
+    assert dotenver.get_secret_name(Path("/path/My_App/test.env.example")) == (
+        "my-app-test-env"
+    )
+
+
+def test_inline_comments_are_not_values():
+    """Test that inline comments are removed from non-dotenv formats."""
+    values = dotenver.parse_dotenv_stream(
+        [
+            "PLAIN=plain # inline comment\n",
+            "QUOTED='quoted # value' # inline comment\n",
+            "HASH=value#hash\n",
+        ]
+    )
+
+    assert json.loads(dotenver.write_json(Path("/path/.env.example"), "", values)) == {
+        "PLAIN": "plain",
+        "QUOTED": "quoted # value",
+        "HASH": "value#hash",
+    }
+    assert dotenver.write_shell(Path("/path/.env.example"), "", values) == (
+        "export PLAIN=plain\n"
+        "export QUOTED='quoted # value'\n"
+        "export HASH='value#hash'\n"
+    )
+    assert '  "PLAIN": "plain"\n' in dotenver.write_secret(
+        Path("/path/.env.example"), "", values
+    )
+
+
+def test_dotenv_is_always_written():
+    """Test that the .env is written, so values are kept, with other formats."""
+    set_dotenv("")
+
+    tamplate = get_tempfile("VARIABLE= ## dotenver:pystr(max_chars=20)\n")
+    json_path = dotenver.get_json_path(Path(tamplate.name))
+
+    dotenver.parse_files([tamplate.name], formats=("json",))
+    with open(json_path) as json_file:
+        first = json.load(json_file)
+
+    dotenver.parse_files([tamplate.name], formats=("json",))
+    with open(json_path) as json_file:
+        assert json.load(json_file) == first
+
+    assert DOTENV_FILE.read() == f"VARIABLE={first['VARIABLE']}\n"
+
+
+def test_output_paths_are_checked_before_writing(monkeypatch):
+    """Test that nothing is written when an output path is not writable."""
+    set_dotenv("")
+
+    json_path = dotenver.get_json_path(Path(TEMPLATE_FILE.name))
+    monkeypatch.setattr(dotenver, "is_writable", lambda path: path != json_path)
+
+    with pytest.raises(PermissionError):
+        dotenver.parse_files([TEMPLATE_FILE.name], formats=("dotenv", "json"))
+
+    assert DOTENV_FILE.read() == ""
+
+
+def test_secret_skips_invalid_keys():
+    """Test that variables which are not valid Secret keys are skipped."""
+    values = dotenver.parse_dotenv_stream(["my:var=1\n", "my-var.1_A=2\n"])
+
+    secret = dotenver.write_secret(Path("/path/.env.example"), "", values)
+
+    assert "my:var" not in secret
+    assert '  "my-var.1_A": "2"\n' in secret
+
+
+def test_malformed_arguments():
+    """Test that malformed arguments raise a ValueError."""
+    with pytest.raises(ValueError, match="a=1\\), b\\(2"):
+        dotenver.parse_arguments("a=1), b(2")
+
+    with pytest.raises(ValueError):
+        dotenver.parse_arguments("a=1)(b=2")
+
+    with pytest.raises(ValueError, match="'a='"):
+        dotenver.parse_arguments("a=")
+
+
+def test_render_stream_does_not_render_values():
+    """Test that existing values are written as is, and not as templates."""
+    template = io.StringIO("TEMPLATE={{ 7 * 7 }}\nBRACES=\nCOMMENT=\nLINES=\n")
+    output = io.StringIO()
+
+    dotenver.render_stream(
+        template,
+        output,
+        dotenver.get_environ_dict(
+            {"BRACES": "{{ 7 * 7 }}", "COMMENT": "ab{#cd", "LINES": 'a\\b\n"c"'}
+        ),
+    )
+
+    expected = """TEMPLATE=49
+BRACES="{{ 7 * 7 }}"
+COMMENT="ab{#cd"
+LINES="a\\\\b\\n\\"c\\""
+"""
+    assert output.getvalue() == expected
+
+
+def test_cli_pipe_mode(monkeypatch, capsys):
+    """Test that the CLI renders stdin to stdout, with existing values."""
+    set_dotenv("EXISTING=existing\nEXTRA=extra\n")
+    template = "EXISTING=\nENVIRON=\nSTATIC=static\n"
+
+    monkeypatch.setattr(sys, "argv", ["dotenver", "-", "--current", DOTENV_FILE.name])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(template))
+    cli.cli()
+    expected = """EXISTING=existing
+ENVIRON
+STATIC=static
+
+######################################
+# Variables not in Dotenver template #
+######################################
+
+EXTRA=extra
+"""
+    assert capsys.readouterr().out == expected
+
+    monkeypatch.setenv("ENVIRON", "environ")
+    monkeypatch.setattr(sys, "argv", ["dotenver", "-", "--environ"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO(template))
+    cli.cli()
+    assert capsys.readouterr().out == 'EXISTING\nENVIRON="environ"\nSTATIC=static\n'
+
+
+def test_cli_current_requires_pipe_mode(monkeypatch):
+    """Test that --current and --environ are rejected outside pipe mode."""
+    for option in ("--current=.env", "--environ"):
+        monkeypatch.setattr(sys, "argv", ["dotenver", option, TEMPLATE_FILE.name])
+        with pytest.raises(SystemExit):
+            cli.cli()
+
+
+def test_include_with_comment():
+    """Test that include lines can have a trailing comment."""
+    set_dotenv("")
+
+    base = get_tempfile("BASE=base\n")
+    tamplate = get_tempfile(f"## dotenver:include {Path(base.name).name} # shared\n")
+
+    dotenver.parse_files([tamplate.name])
+
+    assert DOTENV_FILE.read() == "BASE=base\n"
+
+
+def test_invalid_includes():
+    """Test that include lines without a valid path raise a ValueError."""
+    set_dotenv("")
+
+    for include in ("## dotenver:include", "## dotenver:include a b"):
+        tamplate = get_tempfile(f"{include}\n")
+        with pytest.raises(ValueError):
+            dotenver.parse_files([tamplate.name])
+
+
+def test_variables_defined_in_includes_and_templates():
+    """Test that variables can not be defined in a template and its includes."""
+    set_dotenv("")
+
+    base = get_tempfile("BASE=base\n")
+    include = f"## dotenver:include {Path(base.name).name}\n"
+
+    for content in (f"BASE=template\n{include}", f"{include}BASE=template\n"):
+        tamplate = get_tempfile(content)
+        with pytest.raises(ValueError, match="BASE"):
+            dotenver.parse_files([tamplate.name])
+
+    tamplate = get_tempfile(f"{include}{include}")
+    with pytest.raises(ValueError, match="BASE"):
+        dotenver.parse_files([tamplate.name])